@@ -1,188 +1,293 @@
+import asyncio
+import functools
 import logging
 import httpx
+import msgspec
+import orjson
 import pydantic
 import stamina
 
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from time import monotonic
+from typing import Optional, Union
+from pydantic.datetime_parse import parse_datetime
+from app.actions.types import (
+    Farm,
+    FarmLocation,
+    RumiCircuitOpenException,
+    RumiNotFoundException,
+    RumiUnauthorizedException,
+)
 from app.services.state import IntegrationStateManager
 
 
 logger = logging.getLogger(__name__)
 state_manager = IntegrationStateManager()
+_rumi_client: httpx.AsyncClient | None = None
+
+
+def _get_rumi_client() -> httpx.AsyncClient:
+    global _rumi_client
+    if _rumi_client is None:
+        _rumi_client = httpx.AsyncClient(
+            timeout=120,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+    return _rumi_client
+
+
+async def close_rumi_client() -> None:
+    global _rumi_client
+    if _rumi_client is not None:
+        await _rumi_client.aclose()
+        _rumi_client = None
+
+
+class RumiCircuitBreaker:
+    """
+    Fails fast once a Rumi host keeps failing, instead of stacking retries and backoff on every call.
+    After fail_max consecutive failures the circuit opens for reset_timeout seconds,
+    then a single trial call is let through to probe whether the host has recovered.
+    Other callers keep failing fast for another reset_timeout while the probe is in flight.
+    """
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def allow_request(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        # Half-open: this call is the probe. Restarting the cool-down holds back everyone else,
+        # and lets another probe through later if this one never reports back
+        self.opened_at = monotonic()
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.fail_max:
+            self.opened_at = monotonic()
+
+
+_circuit_breakers: dict[str, RumiCircuitBreaker] = {}
+
+
+async def _rumi_get(base_url, url, **kwargs) -> httpx.Response:
+    breaker = _circuit_breakers.get(base_url)
+    if breaker is None:
+        breaker = _circuit_breakers[base_url] = RumiCircuitBreaker()
+    if not breaker.allow_request():
+        raise RumiCircuitOpenException(base_url)
+    try:
+        response = await _get_rumi_client().get(url, **kwargs)
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    elif response.status_code != 429:
+        # Throttling says nothing about the host's health, so it leaves the breaker as is
+        breaker.record_success()
+    return response
+
+
+class RumiTokenAuth(httpx.Auth):
+    def __init__(self, token: str):
+        self._header = f"Token {token}"
+
+    def auth_flow(self, request):
+        request.headers["Authorization"] = self._header
+        yield request
+
+
+@functools.lru_cache(maxsize=128)
+def _get_token_auth(token: str) -> RumiTokenAuth:
+    # The pooled client is shared across integrations, so the token is set per request, not on the client
+    return RumiTokenAuth(token)
+
+
+# pydantic caches the parsing model per type, so reuse the same one across calls
+_FARM_LIST = list[Farm]
+
+
+def parse_rumi_timestamp(value):
+    # Rumi timestamps are "YYYY-MM-DDTHH:MM:SS[.ffffff]Z"; slice those directly
+    # and let pydantic handle any other format
+    if isinstance(value, str) and value[-1:] == "Z" and (len(value) == 20 or value[19:20] == "."):
+        fraction = value[20:-1]
+        try:
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                int(fraction[:6].ljust(6, "0")) if fraction else 0,
+                tzinfo=timezone.utc,
+            )
+        except ValueError:
+            pass
+    time = parse_datetime(value)
+    if not time.tzinfo:
+        return time.replace(tzinfo=timezone.utc)
+    return time
 
 
-class Farm(pydantic.BaseModel):
-    id: str = pydantic.Field(alias='_id')
-    name: str
-    nif: Optional[str]
-    rega: Optional[str]
+class TimelapsePoint(msgspec.Struct):
+    time: str = msgspec.field(name="_time")
+    location: str
 
-    class Config:
-        allow_population_by_field_name = True
 
+class AnimalTimelapse(msgspec.Struct):
+    # Required: rows are built with construct(), so this is the only check that a device is present.
+    # Some devices come back with numeric ids, which are normalized to str like pydantic used to
+    rumi_id: Union[str, int]
+    official_tag: Optional[str] = None
+    locations: list[TimelapsePoint] = []
 
-class FarmLocation(pydantic.BaseModel):
-    location: tuple[float, float] = pydantic.Field(alias='_location')
-    time: datetime = pydantic.Field(alias='_time')
-    device_name: str
-    official_tag: str
 
-    @pydantic.validator('time', always=True)
-    def parse_time_string(cls, v):
-        if not v.tzinfo:
-            return v.replace(tzinfo=timezone.utc)
-        return v
+# Decodes and type-checks the whole timelapse payload in one pass, without an intermediate dict tree
+_timelapse_decoder = msgspec.json.Decoder(Optional[list[AnimalTimelapse]])
 
-    @pydantic.validator('location', pre=True, always=True)
-    def split_location(cls, v):
-        lat, lon = v.split("::")
-        return float(lat), float(lon)
 
-    class Config:
-        allow_population_by_field_name = True
+def _build_farm_location(animal: AnimalTimelapse, point: TimelapsePoint):
+    # Skip per-row model validation, doing only the coercions FarmLocation's validators would
+    lat, lon = point.location.split("::")
+    time = parse_rumi_timestamp(point.time)
+    return FarmLocation.construct(
+        location=(float(lat), float(lon)),
+        time=time,
+        device_name=str(animal.rumi_id),
+        official_tag=animal.official_tag,
+    )
 
 
-class RumiNotFoundException(Exception):
-    def __init__(self, error: Exception, message: str, status_code=404):
-        self.status_code = status_code
-        self.message = message
-        self.error = error
-        super().__init__(f"'{self.status_code}: {self.message}, Error: {self.error}'")
+# Transient errors worth retrying: rate limiting (429) and server-side failures. Other 4xx responses are raised right away
+_RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
 
 
-class RumiUnauthorizedException(Exception):
-    def __init__(self, error: Exception, message: str, status_code=401):
-        self.status_code = status_code
-        self.message = message
-        self.error = error
-        super().__init__(f"'{self.status_code}: {self.message}, Error: {self.error}'")
+class RumiRetryableStatusError(httpx.HTTPStatusError):
+    pass
 
 
-@stamina.retry(on=httpx.HTTPError, wait_initial=4.0, wait_jitter=5.0, wait_max=32.0)
+@stamina.retry(on=(httpx.TransportError, RumiRetryableStatusError), attempts=4, wait_initial=1.0, wait_jitter=2.0, wait_max=16.0)
 async def get_farms(integration, base_url, auth):
-    async with httpx.AsyncClient(timeout=120) as session:
-        logger.info(f"-- Getting farms for integration ID: {integration.id} User ID: {auth.user_id} --")
+    logger.info(f"-- Getting farms for integration ID: {integration.id} User ID: {auth.user_id} --")
+
+    url = f"{base_url}/users/{auth.user_id}/farms"
+
+    try:
+        response = await _rumi_get(base_url, url, auth=_get_token_auth(auth.token.get_secret_value()))
+        if response.is_error:
+            logger.warning(f"Error 'get_farms'. Response body: {response.text}")
+        response.raise_for_status()
+        parsed_response = orjson.loads(response.content)
+        if parsed_response:
+            return pydantic.parse_obj_as(_FARM_LIST, parsed_response)
+        else:
+            return response.text
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            raise RumiUnauthorizedException(e, "Unauthorized access")
+        elif e.response.status_code == 404:
+            raise RumiNotFoundException(e, "User not found")
+        elif e.response.status_code in _RETRYABLE_STATUS_CODES:
+            raise RumiRetryableStatusError(str(e), request=e.request, response=e.response) from e
+        raise e
+
+
+_TIMELAPSE_MAX_WINDOW = timedelta(hours=48)
+
 
-        url = f"{base_url}/users/{auth.user_id}/farms"
+@stamina.retry(on=(httpx.TransportError, RumiRetryableStatusError), attempts=4, wait_initial=1.0, wait_jitter=2.0, wait_max=16.0)
+async def get_farm_observations(integration, base_url, config):
+    all_observations = []
+    chunk_start = config.start
+
+    while chunk_start < config.stop:
+        chunk_end = min(chunk_start + _TIMELAPSE_MAX_WINDOW, config.stop)
+        url = f"{base_url}/farms/{config.farm_id}/rumi/realtime/timelapse"
+        params = {
+            "start": chunk_start.isoformat(),
+            "stop": chunk_end.isoformat(),
+            "user_id": config.user_id,
+        }
+
+        logger.info(
+            f"-- Getting observations for integration ID: {integration.id} "
+            f"Farm: {config.farm_id} [{chunk_start.isoformat()} → {chunk_end.isoformat()}] --"
+        )
 
         try:
-            response = await session.get(url, headers={"Authorization": f"Token {auth.token.get_secret_value()}"})
+            response = await _rumi_get(base_url, url, params=params, auth=_get_token_auth(config.token))
             if response.is_error:
-                logger.warning(f"Error 'get_farms'. Response body: {response.text}")
+                logger.warning(f"Error 'get_farm_observations'. Response body: {response.text}")
             response.raise_for_status()
-            parsed_response = response.json()
+            parsed_response = _timelapse_decoder.decode(response.content)
             if parsed_response:
-                return [Farm.parse_obj(item) for item in parsed_response]
-            else:
-                return response.text
+                for animal in parsed_response:
+                    for point in animal.locations:
+                        all_observations.append(_build_farm_location(animal, point))
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 401:
                 raise RumiUnauthorizedException(e, "Unauthorized access")
             elif e.response.status_code == 404:
                 raise RumiNotFoundException(e, "User not found")
+            elif e.response.status_code in _RETRYABLE_STATUS_CODES:
+                raise RumiRetryableStatusError(str(e), request=e.request, response=e.response) from e
             raise e
 
+        chunk_start = chunk_end
 
-_TIMELAPSE_MAX_WINDOW = timedelta(hours=48)
+    return all_observations or None
 
 
-@stamina.retry(on=httpx.HTTPError, wait_initial=4.0, wait_jitter=5.0, wait_max=32.0)
-async def get_farm_observations(integration, base_url, config):
-    async with httpx.AsyncClient(timeout=120) as session:
-        all_observations = []
-        chunk_start = config.start
-
-        while chunk_start < config.stop:
-            chunk_end = min(chunk_start + _TIMELAPSE_MAX_WINDOW, config.stop)
-            url = f"{base_url}/farms/{config.farm_id}/rumi/realtime/timelapse"
-            params = {
-                "start": chunk_start.isoformat(),
-                "stop": chunk_end.isoformat(),
-                "user_id": config.user_id,
-            }
-
-            logger.info(
-                f"-- Getting observations for integration ID: {integration.id} "
-                f"Farm: {config.farm_id} [{chunk_start.isoformat()} → {chunk_end.isoformat()}] --"
-            )
+_ANIMAL_ENDPOINTS = {
+    "bull": "bulls",
+    "cow": "cows",
+    "calf": "calves",
+}
 
-            try:
-                response = await session.get(url, params=params, headers={"Authorization": f"Token {config.token}"})
-                if response.is_error:
-                    logger.warning(f"Error 'get_farm_observations'. Response body: {response.text}")
-                response.raise_for_status()
-                parsed_response = response.json()
-                if parsed_response:
-                    for animal in parsed_response:
-                        for point in animal.get("locations", []):
-                            all_observations.append(FarmLocation.parse_obj({
-                                "_location": point.get("location"),
-                                "_time": point.get("_time"),
-                                "device_name": animal.get("rumi_id"),
-                                "official_tag": animal.get("official_tag"),
-                            }))
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    raise RumiUnauthorizedException(e, "Unauthorized access")
-                elif e.response.status_code == 404:
-                    raise RumiNotFoundException(e, "User not found")
-                raise e
-
-            chunk_start = chunk_end
-
-        return all_observations or None
-
-
-@stamina.retry(on=httpx.HTTPError, wait_initial=4.0, wait_jitter=5.0, wait_max=32.0)
+
+@stamina.retry(on=(httpx.TransportError, RumiRetryableStatusError), attempts=4, wait_initial=1.0, wait_jitter=2.0, wait_max=16.0)
 async def get_animals_info(integration, base_url, config):
     animals_dict = {}
-    async with httpx.AsyncClient(timeout=120) as session:
-        try:
-            params = {
-                "user_id": config.user_id
-            }
-
-            bulls_url = f"{base_url}/farms/{config.farm_id}/bulls"
-
-            logger.info(f"-- Getting bulls info for integration ID: {integration.id} Farm: {config.farm_id} --")
-
-            bulls_response = await session.get(bulls_url, params=params, headers={"Authorization": f"Token {config.token}"})
-            if bulls_response.is_error:
-                logger.warning(f"Error in bulls 'get_animals_info'. Response body: {bulls_response.text}")
-            bulls_response.raise_for_status()
-            parsed_response = bulls_response.json()
-            if parsed_response:
-                animals_dict["bull"] = parsed_response
-
-            cows_url = f"{base_url}/farms/{config.farm_id}/cows"
-
-            logger.info(f"-- Getting cows info for integration ID: {integration.id} Farm: {config.farm_id} --")
-
-            cows_response = await session.get(cows_url, params=params, headers={"Authorization": f"Token {config.token}"})
-            if cows_response.is_error:
-                logger.warning(f"Error in cows 'get_animals_info'. Response body: {cows_response.text}")
-            cows_response.raise_for_status()
-            parsed_response = cows_response.json()
-            if parsed_response:
-                animals_dict["cow"] = parsed_response
-
-            calves_url = f"{base_url}/farms/{config.farm_id}/calves"
-
-            logger.info(f"-- Getting calves info for integration ID: {integration.id} Farm: {config.farm_id} --")
+    try:
+        params = {
+            "user_id": config.user_id
+        }
+
+        logger.info(f"-- Getting bulls, cows and calves info for integration ID: {integration.id} Farm: {config.farm_id} --")
+
+        # The three endpoints are independent, so request them concurrently
+        responses = await asyncio.gather(*[
+            _rumi_get(
+                base_url,
+                f"{base_url}/farms/{config.farm_id}/{endpoint}",
+                params=params,
+                auth=_get_token_auth(config.token)
+            )
+            for endpoint in _ANIMAL_ENDPOINTS.values()
+        ])
 
-            calves_response = await session.get(calves_url, params=params, headers={"Authorization": f"Token {config.token}"})
-            if calves_response.is_error:
-                logger.warning(f"Error in calves 'get_animals_info'. Response body: {calves_response.text}")
-            calves_response.raise_for_status()
-            parsed_response = calves_response.json()
+        for (animal_type, endpoint), response in zip(_ANIMAL_ENDPOINTS.items(), responses):
+            if response.is_error:
+                logger.warning(f"Error in {endpoint} 'get_animals_info'. Response body: {response.text}")
+            response.raise_for_status()
+            parsed_response = orjson.loads(response.content)
             if parsed_response:
-                animals_dict["calf"] = parsed_response
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 401:
-                raise RumiUnauthorizedException(e, "Unauthorized access")
-            elif e.response.status_code == 404:
-                raise RumiNotFoundException(e, "User not found")
-            raise e
-
-        return animals_dict
+                animals_dict[animal_type] = parsed_response
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            raise RumiUnauthorizedException(e, "Unauthorized access")
+        elif e.response.status_code == 404:
+            raise RumiNotFoundException(e, "User not found")
+        elif e.response.status_code in _RETRYABLE_STATUS_CODES:
+            raise RumiRetryableStatusError(str(e), request=e.request, response=e.response) from e
+        raise e
+
+    return animals_dict
@@ -29,6 +29,16 @@ class PullObservationsConfig(PullActionConfiguration):
             widget="range",  # This will be rendered ad a range slider
         )
     )
+    min_refresh_minutes: int = FieldWithUIOptions(
+        5,
+        title="Minimum Refresh Minutes",
+        description="Skip farms whose latest observation is more recent than this many minutes. Min: 0 (always fetch), Default: 5",
+        ge=0,
+        le=60,
+        ui_options=UIOptions(
+            widget="range",  # This will be rendered ad a range slider
+        )
+    )
 
 
 class PullFarmObservationsConfig(PullActionConfiguration):
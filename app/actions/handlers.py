@@ -1,3 +1,5 @@
+import anyio
+import asyncio
 import httpx
 import logging
 
@@ -17,6 +19,8 @@ state_manager = IntegrationStateManager()
 
 
 RUMI_BASE_URL = "https://rumi-api.innogando.com/v1"
+MAX_CONCURRENT_BATCHES = 8
+MAX_CONCURRENT_FARM_TRIGGERS = 16
 
 
 def is_valid_location(location):
@@ -28,16 +32,30 @@ def is_valid_location(location):
     return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 360.0
 
 
-async def transform(integration_id, farm, animals_info, observations):
-    transformed_data = []
+def build_rumi_id_map(animals_info):
+    rumi_id_map = {}
+    for animal_type, animal_type_info in animals_info.items():
+        for animal in animal_type_info:
+            animal_info = {"type": animal_type, **animal}
+            # Precompute what only depends on the animal, so transform doesn't redo it per observation
+            # Observations carry the id as str, whatever type the animals endpoint returned
+            rumi_id_map[str(animal["rumi_id"])] = {
+                "info": animal_info,
+                "subject_type": f"rumi-{animal_type}",
+                "additional": {key: value for key, value in animal_info.items() if value},
+            }
+    return rumi_id_map
 
-    rumi_id_map = {
-        animal["rumi_id"]: {"type": animal_type, **animal}
-        for animal_type, animal_type_info in animals_info.items()
-        for animal in animal_type_info
-    }
+
+async def transform(integration_id, farm, rumi_id_map, observations):
+    transformed_data = []
+    latest_time = None
 
     for observation in observations:
+        # Track the latest time over every observation, including discarded ones
+        if latest_time is None or observation.time > latest_time:
+            latest_time = observation.time
+
         if not is_valid_location(observation.location):
             message = (
                 f"Invalid location for observation: {observation.dict()}. Farm: {farm.farm_name}."
@@ -51,7 +69,15 @@ async def transform(integration_id, farm, animals_info, observations):
             )
             continue
 
-        animal_info = rumi_id_map.get(observation.device_name, {})
+        animal = rumi_id_map.get(observation.device_name)
+        if animal:
+            animal_info = animal["info"]
+            subject_type = animal["subject_type"]
+            additional_info = animal["additional"]
+        else:
+            animal_info = {}
+            subject_type = "unassigned"
+            additional_info = {}
 
         # check if official_tag is None, if so, use device_name
         if not observation.official_tag:
@@ -64,12 +90,6 @@ async def transform(integration_id, farm, animals_info, observations):
            f"{observation.official_tag} ({observation.device_name})"
         )
 
-        subject_type = f"rumi-{animal_info.get('type')}" if animal_info else "unassigned"
-
-        additional_info = {
-            key: value for key, value in animal_info.items() if value
-        }
-
         transformed_data.append(
             {
                 "source_name": source_name,
@@ -90,7 +110,7 @@ async def transform(integration_id, farm, animals_info, observations):
             }
         )
 
-    return transformed_data
+    return transformed_data, latest_time
 
 
 async def get_animals_info(integration, base_url, action_config):
@@ -134,6 +154,9 @@ async def action_auth(integration, action_config: AuthenticateConfig):
         return {"valid_credentials": False, "status_code": e.status_code, "message": "Invalid token"}
     except client.RumiNotFoundException as e:
         return {"valid_credentials": False, "status_code": e.status_code, "message": "Invalid user_id"}
+    except client.RumiCircuitOpenException:
+        logger.warning(f"Rumi API circuit is open, skipping 'auth' action for integration {integration.id}")
+        return {"error": True, "circuit_open": True}
     except httpx.HTTPStatusError as e:
         return {"error": True, "status_code": e.response.status_code}
 
@@ -150,34 +173,51 @@ async def action_pull_observations(integration, action_config: PullObservationsC
         if farms:
             logger.info(f"Found {len(farms)} farms for integration {integration.id} User ID: {auth_config.user_id}")
             now = datetime.now(timezone.utc)
-            farms_triggered = 0
-            for farm in farms:
-                logger.info(f"Triggering 'action_fetch_farm_observations' action for farm {farm.id} to extract observations...")
-                device_state = await state_manager.get_state(
-                    integration_id=integration.id,
-                    action_id="pull_observations",
-                    source_id=farm.id
-                )
-                if not device_state:
-                    logger.info(f"Setting initial lookback days for device {farm.id} to {action_config.default_lookback_days}")
-                    start = (now - timedelta(days=action_config.default_lookback_days)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-                else:
-                    logger.info(f"Setting begin time for device {farm.id} to {device_state.get('updated_at')}")
-                    start = device_state.get("updated_at")
-
-                parsed_config = PullFarmObservationsConfig(
-                    start=start,
-                    farm_id=farm.id,
-                    farm_name=farm.name,
-                    user_id=auth_config.user_id,
-                    token=auth_config.token.get_secret_value()
-                )
-                await trigger_action(integration.id, "fetch_farm_observations", config=parsed_config)
-                farms_triggered += 1
-            return {"farms_triggered": farms_triggered}
+            farm_states = await state_manager.mget_state(
+                integration_id=integration.id,
+                action_id="pull_observations",
+                source_ids=[farm.id for farm in farms]
+            )
+            min_refresh = timedelta(minutes=action_config.min_refresh_minutes)
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_FARM_TRIGGERS)
+
+            async def trigger_farm(farm):
+                async with semaphore:
+                    device_state = farm_states.get(farm.id)
+                    if not device_state:
+                        logger.info(f"Setting initial lookback days for device {farm.id} to {action_config.default_lookback_days}")
+                        start = now - timedelta(days=action_config.default_lookback_days)
+                    else:
+                        start = device_state.get("updated_at")
+                        # Nothing new to fetch yet if the farm was updated moments ago
+                        if start and now - client.parse_rumi_timestamp(start) < min_refresh:
+                            logger.info(f"Skipping farm {farm.id}, last updated at {start}")
+                            return False
+                        logger.info(f"Setting begin time for device {farm.id} to {start}")
+
+                    parsed_config = PullFarmObservationsConfig(
+                        start=start,
+                        farm_id=farm.id,
+                        farm_name=farm.name,
+                        user_id=auth_config.user_id,
+                        token=auth_config.token.get_secret_value()
+                    )
+                    logger.info(f"Triggering 'action_fetch_farm_observations' action for farm {farm.id} to extract observations...")
+                    await trigger_action(integration.id, "fetch_farm_observations", config=parsed_config)
+                    return True
+
+            # Let every farm get its trigger before surfacing the first failure
+            results = await asyncio.gather(*[trigger_farm(farm) for farm in farms], return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+            return {"farms_triggered": sum(results)}
         else:
             logger.warning(f"No farms found for integration {integration.id} User ID: {auth_config.user_id}")
             return {"farms_triggered": 0}
+    except client.RumiCircuitOpenException as e:
+        logger.warning(f"'pull_observations' skipped for integration {integration.id}. {e}")
+        return {"farms_triggered": 0, "circuit_open": True}
     except (client.RumiUnauthorizedException, client.RumiNotFoundException) as e:
         message = f"Failed to authenticate with integration {integration.id} using {auth_config}. Exception: {e}"
         logger.exception(message)
@@ -193,22 +233,30 @@ async def action_fetch_farm_observations(integration, action_config: PullFarmObs
     logger.info(f"Executing action 'fetch_farm_observations' for integration ID {integration.id} and action_config {action_config}...")
 
     base_url = integration.base_url or RUMI_BASE_URL
-    observations_extracted = 0
 
     try:
         observations = await client.get_farm_observations(integration, base_url, action_config)
         if observations:
             logger.info(f"Extracted {len(observations)} observations for farm {action_config.farm_id}")
             animals_info = await get_animals_info(integration, base_url, action_config)
-            transformed_data = await transform(integration.id, action_config, animals_info, observations)
+            rumi_id_map = build_rumi_id_map(animals_info)
+            transformed_data, latest_time = await transform(integration.id, action_config, rumi_id_map, observations)
+
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+            responses = []
+
+            async def send_batch(i, batch):
+                async with semaphore:
+                    logger.info(f'Sending observations batch #{i}: {len(batch)} observations. Farm: {action_config.farm_id}')
+                    responses.append(await send_observations_to_gundi(observations=batch, integration_id=integration.id))
 
-            for i, batch in enumerate(generate_batches(transformed_data, 200)):
-                logger.info(f'Sending observations batch #{i}: {len(batch)} observations. Farm: {action_config.farm_id}')
-                response = await send_observations_to_gundi(observations=batch, integration_id=integration.id)
-                observations_extracted += len(response)
+            # The task group cancels and awaits the remaining sends as soon as one batch fails
+            async with anyio.create_task_group() as task_group:
+                for i, batch in enumerate(generate_batches(transformed_data, 200)):
+                    task_group.start_soon(send_batch, i, batch)
+            observations_extracted = sum(len(response) for response in responses)
 
             # Save latest device updated_at
-            latest_time = max(observations, key=lambda obs: obs.time).time
             state = {"updated_at": latest_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ")}
 
             await state_manager.set_state(
@@ -222,6 +270,9 @@ async def action_fetch_farm_observations(integration, action_config: PullFarmObs
         else:
             logger.warning(f"No observations found for farm {action_config.farm_id}")
             return {"observations_extracted": 0}
+    except client.RumiCircuitOpenException as e:
+        logger.warning(f"'fetch_farm_observations' skipped for integration {integration.id}, farm {action_config.farm_id}. {e}")
+        return {"observations_extracted": 0, "circuit_open": True}
     except (client.RumiUnauthorizedException, client.RumiNotFoundException) as e:
         message = f"Failed to authenticate with integration {integration.id} using {action_config}. Exception: {e}"
         logger.exception(message)
@@ -1,115 +1,235 @@
+import anyio
 import httpx
+import msgspec
 import pytest
 import respx
 
-from datetime import datetime, timezone
-from app import settings
-from app.actions.handlers import action_auth, action_pull_observations, action_fetch_farm_observations
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+from unittest.mock import AsyncMock
+from app.actions.handlers import action_auth, action_pull_observations, action_fetch_farm_observations, build_rumi_id_map, transform
 from app.actions.configurations import AuthenticateConfig, PullObservationsConfig, PullFarmObservationsConfig
-from app.actions.client import Farm, FarmLocation, RumiUnauthorizedException, RumiNotFoundException, get_farm_observations
+from app.actions.types import Farm, FarmLocation, RumiUnauthorizedException, RumiNotFoundException, RumiCircuitOpenException
+from app.actions.client import RumiCircuitBreaker, get_farm_observations, get_animals_info, get_farms, parse_rumi_timestamp
 
 
-@pytest.mark.asyncio
-async def test_action_auth_success(mocker):
-    integration = mocker.Mock()
-    action_config = mocker.Mock(spec=AuthenticateConfig)
-    mocker.patch('app.actions.client.get_farms', return_value=[{"id": "farm1"}])
+RUMI_BASE_URL = "https://rumi-api.innogando.com/v1"
 
-    result = await action_auth(integration, action_config)
+FARM1 = Farm.parse_obj({"id": "farm1", "name": "Farm 1"})
 
-    assert result == {"valid_credentials": True}
+_UNAUTH_EXC = RumiUnauthorizedException(Exception(), "Unauthorized access")
+_NOTFOUND_EXC = RumiNotFoundException(Exception(), "User not found")
 
-@pytest.mark.asyncio
-async def test_action_auth_unauthorized(mocker):
-    integration = mocker.Mock()
-    action_config = mocker.Mock(spec=AuthenticateConfig)
-    mocker.patch('app.actions.client.get_farms', side_effect=RumiUnauthorizedException(Exception(), "Unauthorized access"))
+# Resolved once at import; each start() installs a fresh AsyncMock
+_GET_FARMS_PATCH = mock.patch('app.actions.client.get_farms', new_callable=AsyncMock)
 
-    result = await action_auth(integration, action_config)
 
-    assert result == {"valid_credentials": False, "status_code": 401, "message": "Invalid token"}
+@pytest.fixture(scope="module")
+def anyio_backend():
+    return "asyncio"
 
-@pytest.mark.asyncio
-async def test_action_auth_not_found(mocker):
-    integration = mocker.Mock()
-    action_config = mocker.Mock(spec=AuthenticateConfig)
-    mocker.patch('app.actions.client.get_farms', side_effect=RumiNotFoundException(Exception(), "User not found"))
 
-    result = await action_auth(integration, action_config)
+# The handlers only read the id, base_url and the auth configuration from the integration,
+# so a plain namespace stands in for a Mock or a fully validated Integration
+@pytest.fixture(scope="session")
+def rumi_integration():
+    return SimpleNamespace(
+        id="429face7-855e-4e01-9cc8-fe69bf437cd9",
+        base_url=None,
+        configurations=[
+            SimpleNamespace(action=SimpleNamespace(value="auth"), data={"user_id": "user", "token": "faketoken123"}),
+        ],
+    )
 
-    assert result == {"valid_credentials": False, "status_code": 404, "message": "Invalid user_id"}
 
-@pytest.mark.asyncio
-async def test_action_pull_observations_triggers_fetch_farm_observations_action(mocker, integration_v2, mock_publish_event):
-    settings.TRIGGER_ACTIONS_ALWAYS_SYNC = False
-    settings.INTEGRATION_COMMANDS_TOPIC = "rumi-actions-topic"
+# action_auth only hands the config to the (mocked) get_farms, so a plain record is enough
+@dataclass(frozen=True, slots=True)
+class _StubAuthCfg:
+    user_id: str = "user"
+    token: str = "faketoken123"
 
-    mocker.patch('app.actions.client.get_farms', return_value=[
-        Farm.parse_obj({"id": "farm1", "name": "Farm 1"})
-    ])
-    mocker.patch("app.services.state.IntegrationStateManager.get_state", return_value=None)
-    mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_scheduler.trigger_action", return_value=None)
-    mocker.patch("app.services.action_scheduler.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_runner.execute_action", return_value=None)
 
-    integration = integration_v2
+@pytest.fixture(scope="session")
+def auth_action_config():
+    return _StubAuthCfg()
 
-    # Modify auth config
-    integration.configurations[2].data = {"user_id": "user", "token": "faketoken123"}
 
-    action_config = PullObservationsConfig(default_lookback_days=5)
+@pytest.fixture(scope="session")
+def pull_obs_config():
+    return PullObservationsConfig(default_lookback_days=5, min_refresh_minutes=5)
+
+
+@pytest.fixture
+def pull_obs_patches(mocker, mock_publish_event):
+    """State, event publishing and action scheduling patches shared by the pull_observations tests."""
+    patches = SimpleNamespace(
+        publish_event=mock_publish_event,
+        mget_state=AsyncMock(return_value={}),
+        execute_action=AsyncMock(return_value=None),
+        trigger_action=AsyncMock(return_value=None),
+    )
+    mocker.patch.multiple("app.services.state.IntegrationStateManager", mget_state=patches.mget_state)
+    mocker.patch.multiple("app.services.activity_logger", publish_event=patches.publish_event)
+    mocker.patch.multiple(
+        "app.services.action_runner",
+        publish_event=patches.publish_event,
+        execute_action=patches.execute_action,
+    )
+    mocker.patch.multiple("app.services.action_scheduler", publish_event=patches.publish_event)
+    # handlers imports trigger_action by name, so patch it where it is looked up
+    mocker.patch.multiple("app.actions.handlers", trigger_action=patches.trigger_action)
+    return patches
+
 
-    result = await action_pull_observations(integration, action_config)
+@pytest.fixture
+def mock_get_farms():
+    yield _GET_FARMS_PATCH.start()
+    _GET_FARMS_PATCH.stop()
+
+
+@pytest.fixture(autouse=True)
+def _reset_circuit_breakers(mocker):
+    # Breakers are per-process state keyed by base_url; start every test with closed circuits
+    mocker.patch.dict("app.actions.client._circuit_breakers", clear=True)
+
+
+@pytest.fixture(autouse=True)
+def _patch_get_farms(request):
+    # Tests declare the Rumi get_farms behavior with @pytest.mark.get_farms(return_value=... / side_effect=...)
+    marker = request.node.get_closest_marker("get_farms")
+    if marker:
+        request.getfixturevalue("mock_get_farms").configure_mock(**marker.kwargs)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("expected", [
+    pytest.param(
+        {"valid_credentials": True},
+        marks=pytest.mark.get_farms(return_value=[{"id": "farm1"}]),
+        id="success",
+    ),
+    pytest.param(
+        {"valid_credentials": False, "status_code": 401, "message": "Invalid token"},
+        marks=pytest.mark.get_farms(side_effect=_UNAUTH_EXC),
+        id="unauthorized",
+    ),
+    pytest.param(
+        {"valid_credentials": False, "status_code": 404, "message": "Invalid user_id"},
+        marks=pytest.mark.get_farms(side_effect=_NOTFOUND_EXC),
+        id="not_found",
+    ),
+    pytest.param(
+        {"error": True, "circuit_open": True},
+        marks=pytest.mark.get_farms(side_effect=RumiCircuitOpenException(RUMI_BASE_URL)),
+        id="circuit_open",
+    ),
+])
+async def test_action_auth(rumi_integration, auth_action_config, expected):
+    result = await action_auth(rumi_integration, auth_action_config)
+
+    assert result == expected
+
+@pytest.mark.anyio
+@pytest.mark.get_farms(return_value=[FARM1])
+async def test_action_pull_observations_triggers_fetch_farm_observations_action(monkeypatch, rumi_integration, pull_obs_patches, pull_obs_config):
+    from app import settings
+
+    monkeypatch.setattr(settings, "TRIGGER_ACTIONS_ALWAYS_SYNC", False)
+    monkeypatch.setattr(settings, "INTEGRATION_COMMANDS_TOPIC", "rumi-actions-topic")
+
+    before = datetime.now(timezone.utc)
+    result = await action_pull_observations(rumi_integration, pull_obs_config)
+    after = datetime.now(timezone.utc)
 
     assert result == {"farms_triggered": 1}
+    pull_obs_patches.trigger_action.assert_awaited_once()
+    integration_id, action_id = pull_obs_patches.trigger_action.call_args.args
+    config = pull_obs_patches.trigger_action.call_args.kwargs["config"]
+    assert (integration_id, action_id) == (rumi_integration.id, "fetch_farm_observations")
+    assert (config.farm_id, config.farm_name, config.user_id, config.token) == ("farm1", "Farm 1", "user", "faketoken123")
+    # No saved state: start is a tz-aware datetime default_lookback_days back
+    lookback = timedelta(days=pull_obs_config.default_lookback_days)
+    assert before - lookback <= config.start <= after - lookback
 
-@pytest.mark.asyncio
-async def test_action_pull_observations_no_farms(mocker, integration_v2, mock_publish_event):
-    mocker.patch('app.actions.client.get_farms', return_value=[])
-    mocker.patch("app.services.state.IntegrationStateManager.get_state", return_value=None)
-    mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_scheduler.trigger_action", return_value=None)
-    mocker.patch("app.services.action_scheduler.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_runner.execute_action", return_value=None)
 
-    integration = integration_v2
+@pytest.mark.anyio
+@pytest.mark.get_farms(return_value=[FARM1])
+async def test_action_pull_observations_resumes_from_saved_state(rumi_integration, pull_obs_patches, pull_obs_config):
+    pull_obs_patches.mget_state.return_value = {"farm1": {"updated_at": "2026-04-21T11:00:00.000000Z"}}
 
-    # Modify auth config
-    integration.configurations[2].data = {"user_id": "user", "token": "faketoken123"}
+    result = await action_pull_observations(rumi_integration, pull_obs_config)
 
-    action_config = PullObservationsConfig(default_lookback_days=5)
+    assert result == {"farms_triggered": 1}
+    config = pull_obs_patches.trigger_action.call_args.kwargs["config"]
+    assert config.start == datetime(2026, 4, 21, 11, 0, 0, tzinfo=timezone.utc)
+
+@pytest.mark.anyio
+@pytest.mark.get_farms(return_value=[FARM1])
+async def test_action_pull_observations_skips_recently_updated_farms(rumi_integration, pull_obs_patches, pull_obs_config):
+    recently = (datetime.now(timezone.utc) - timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    pull_obs_patches.mget_state.return_value = {"farm1": {"updated_at": recently}}
 
-    result = await action_pull_observations(integration, action_config)
+    result = await action_pull_observations(rumi_integration, pull_obs_config)
 
     assert result == {"farms_triggered": 0}
+    pull_obs_patches.trigger_action.assert_not_called()
 
-@pytest.mark.asyncio
-async def test_action_pull_observations_unauthorized(mocker, integration_v2, mock_publish_event):
-    mocker.patch('app.actions.client.get_farms', side_effect=RumiUnauthorizedException(Exception(), "Unauthorized access"))
-    mocker.patch("app.services.state.IntegrationStateManager.get_state", return_value=None)
-    mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_scheduler.trigger_action", return_value=None)
-    mocker.patch("app.services.action_scheduler.publish_event", mock_publish_event)
-    mocker.patch("app.services.action_runner.execute_action", return_value=None)
+@pytest.mark.anyio
+@pytest.mark.get_farms(return_value=[])
+async def test_action_pull_observations_no_farms(rumi_integration, pull_obs_patches, pull_obs_config):
+    result = await action_pull_observations(rumi_integration, pull_obs_config)
 
-    integration = integration_v2
+    assert result == {"farms_triggered": 0}
 
-    # Modify auth config
-    integration.configurations[2].data = {"user_id": "user", "token": "faketoken123"}
+@pytest.mark.anyio
+@pytest.mark.get_farms(side_effect=_UNAUTH_EXC)
+async def test_action_pull_observations_unauthorized(rumi_integration, pull_obs_patches, pull_obs_config):
+    with pytest.raises(RumiUnauthorizedException):
+        await action_pull_observations(rumi_integration, pull_obs_config)
 
-    action_config = PullObservationsConfig(default_lookback_days=5)
 
-    with pytest.raises(RumiUnauthorizedException):
-        await action_pull_observations(integration, action_config)
+@pytest.mark.anyio
+@pytest.mark.get_farms(side_effect=RumiCircuitOpenException(RUMI_BASE_URL))
+async def test_action_pull_observations_circuit_open(rumi_integration, pull_obs_patches, pull_obs_config):
+    result = await action_pull_observations(rumi_integration, pull_obs_config)
 
+    assert result == {"farms_triggered": 0, "circuit_open": True}
 
-# --- action_fetch_farm_observations ---
 
-RUMI_BASE_URL = "https://rumi-api.innogando.com/v1"
+def test_circuit_breaker_opens_after_consecutive_failures(mocker):
+    mock_monotonic = mocker.patch("app.actions.client.monotonic", return_value=100.0)
+    breaker = RumiCircuitBreaker(fail_max=2, reset_timeout=30)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    # Half-open once the cool-down elapses: one probe goes through, concurrent callers still fail fast
+    mock_monotonic.return_value = 131.0
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.failures == 0
+    assert breaker.allow_request()
+
+
+def test_circuit_breaker_reopens_when_probe_fails(mocker):
+    mock_monotonic = mocker.patch("app.actions.client.monotonic", return_value=100.0)
+    breaker = RumiCircuitBreaker(fail_max=1, reset_timeout=30)
+    breaker.record_failure()
+
+    mock_monotonic.return_value = 131.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    mock_monotonic.return_value = 150.0
+    assert not breaker.allow_request()
+
+
+# --- action_fetch_farm_observations ---
 
 MOCK_TIMELAPSE_RESPONSE = [
     {
@@ -145,24 +265,113 @@ def farm_action_config():
     )
 
 
-@pytest.mark.asyncio
+@pytest.mark.anyio
 async def test_action_fetch_farm_observations_success(mocker, integration_v2, mock_publish_event, farm_action_config):
-    mocker.patch("app.actions.client.get_farm_observations", return_value=MOCK_FARM_LOCATIONS)
-    mocker.patch("app.actions.handlers.get_animals_info", return_value=MOCK_ANIMALS_INFO)
-    mocker.patch("app.actions.handlers.send_observations_to_gundi", return_value=[{"id": "obs1"}, {"id": "obs2"}])
-    mocker.patch("app.services.state.IntegrationStateManager.get_state", return_value=None)
-    mocker.patch("app.services.state.IntegrationStateManager.set_state", return_value=None)
+    mocker.patch("app.actions.client.get_farm_observations", new=AsyncMock(return_value=MOCK_FARM_LOCATIONS))
+    mocker.patch("app.actions.handlers.get_animals_info", new=AsyncMock(return_value=MOCK_ANIMALS_INFO))
+    mocker.patch("app.actions.handlers.send_observations_to_gundi", new=AsyncMock(return_value=[{"id": "obs1"}, {"id": "obs2"}]))
+    mocker.patch("app.services.state.IntegrationStateManager.get_state", new=AsyncMock(return_value=None))
+    mock_set_state = mocker.patch("app.services.state.IntegrationStateManager.set_state", new=AsyncMock(return_value=None))
     mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
     mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
 
     result = await action_fetch_farm_observations(integration_v2, farm_action_config)
 
     assert result == {"observations_extracted": 2}
+    mock_set_state.assert_called_once_with(
+        integration_id=integration_v2.id,
+        action_id="pull_observations",
+        state={"updated_at": "2026-04-21T11:00:00.000000Z"},
+        source_id=farm_action_config.farm_id
+    )
 
 
-@pytest.mark.asyncio
+@pytest.fixture
+def fetch_obs_patches(mocker, mock_publish_event):
+    """Patches that make action_fetch_farm_observations send five 200-observation batches."""
+    patches = SimpleNamespace(
+        send_observations_to_gundi=AsyncMock(),
+        set_state=AsyncMock(return_value=None),
+    )
+    mocker.patch("app.actions.client.get_farm_observations", new=AsyncMock(return_value=MOCK_FARM_LOCATIONS))
+    mocker.patch("app.actions.handlers.get_animals_info", new=AsyncMock(return_value=MOCK_ANIMALS_INFO))
+    mocker.patch(
+        "app.actions.handlers.transform",
+        new=AsyncMock(return_value=([{"source": "DEVICE001"}] * 1000, MOCK_FARM_LOCATIONS[-1].time)),
+    )
+    mocker.patch("app.actions.handlers.send_observations_to_gundi", new=patches.send_observations_to_gundi)
+    mocker.patch("app.services.state.IntegrationStateManager.set_state", new=patches.set_state)
+    mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
+    mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
+    return patches
+
+
+@pytest.mark.anyio
+async def test_action_fetch_farm_observations_limits_concurrent_batches(mocker, integration_v2, farm_action_config, fetch_obs_patches):
+    mocker.patch("app.actions.handlers.MAX_CONCURRENT_BATCHES", 2)
+    in_flight = max_in_flight = 0
+
+    async def send(observations, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await anyio.sleep(0.01)
+        in_flight -= 1
+        return observations
+
+    fetch_obs_patches.send_observations_to_gundi.side_effect = send
+
+    result = await action_fetch_farm_observations(integration_v2, farm_action_config)
+
+    assert result == {"observations_extracted": 1000}
+    assert fetch_obs_patches.send_observations_to_gundi.await_count == 5
+    assert max_in_flight == 2
+
+
+@pytest.mark.anyio
+async def test_action_fetch_farm_observations_cancels_pending_batches_on_failure(integration_v2, farm_action_config, fetch_obs_patches):
+    cancelled = 0
+    request = httpx.Request("POST", "https://sensors.api.gundiservice.org/v2/observations/")
+
+    async def send(observations, **kwargs):
+        nonlocal cancelled
+        # The third batch fails while the first two are still being sent
+        if fetch_obs_patches.send_observations_to_gundi.await_count == 3:
+            raise httpx.HTTPStatusError("Server error", request=request, response=httpx.Response(500, request=request))
+        try:
+            await anyio.sleep_forever()
+        except anyio.get_cancelled_exc_class():
+            cancelled += 1
+            raise
+
+    fetch_obs_patches.send_observations_to_gundi.side_effect = send
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await action_fetch_farm_observations(integration_v2, farm_action_config)
+
+    # Every batch still in flight was cancelled and awaited before the action failed
+    assert cancelled >= 2
+    assert cancelled == fetch_obs_patches.send_observations_to_gundi.await_count - 1
+    fetch_obs_patches.set_state.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_action_fetch_farm_observations_circuit_open(mocker, integration_v2, mock_publish_event, farm_action_config):
+    mocker.patch(
+        "app.actions.client.get_farm_observations",
+        new=AsyncMock(side_effect=RumiCircuitOpenException(RUMI_BASE_URL)),
+    )
+    mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
+    mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
+
+    result = await action_fetch_farm_observations(integration_v2, farm_action_config)
+
+    assert result == {"observations_extracted": 0, "circuit_open": True}
+
+
+@pytest.mark.anyio
 async def test_action_fetch_farm_observations_no_observations(mocker, integration_v2, mock_publish_event, farm_action_config):
-    mocker.patch("app.actions.client.get_farm_observations", return_value=None)
+    mocker.patch("app.actions.client.get_farm_observations", new=AsyncMock(return_value=None))
     mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
     mocker.patch("app.services.action_runner.publish_event", mock_publish_event)
 
@@ -171,11 +380,9 @@ async def test_action_fetch_farm_observations_no_observations(mocker, integratio
     assert result == {"observations_extracted": 0}
 
 
-@pytest.mark.asyncio
-async def test_get_farm_observations_chunks_long_window(mocker):
+@pytest.mark.anyio
+async def test_get_farm_observations_chunks_long_window(rumi_integration):
     """A window longer than 48h is split into two timelapse requests."""
-    integration = mocker.Mock()
-    integration.id = "429face7-855e-4e01-9cc8-fe69bf437cd9"
     config = PullFarmObservationsConfig(
         start=datetime(2026, 4, 19, 0, 0, 0, tzinfo=timezone.utc),
         stop=datetime(2026, 4, 22, 0, 0, 0, tzinfo=timezone.utc),  # 3-day window
@@ -189,7 +396,208 @@ async def test_get_farm_observations_chunks_long_window(mocker):
         route = respx.get(f"{RUMI_BASE_URL}/farms/farm123/rumi/realtime/timelapse").mock(
             return_value=httpx.Response(200, json=MOCK_TIMELAPSE_RESPONSE)
         )
-        result = await get_farm_observations(integration, RUMI_BASE_URL, config)
+        result = await get_farm_observations(rumi_integration, RUMI_BASE_URL, config)
 
     assert route.call_count == 2  # 3-day window → two 48h chunks
     assert len(result) == 4        # 2 locations per chunk × 2 chunks
+    assert result[0] == MOCK_FARM_LOCATIONS[0]
+
+
+@pytest.mark.anyio
+async def test_get_farm_observations_allows_missing_official_tag(rumi_integration, farm_action_config):
+    animal = {"rumi_id": "DEVICE001", "locations": [{"_time": "2026-04-21T10:00:00Z", "location": "40.38::-1.61"}]}
+
+    with respx.mock:
+        respx.get(f"{RUMI_BASE_URL}/farms/farm123/rumi/realtime/timelapse").mock(
+            return_value=httpx.Response(200, json=[animal])
+        )
+        result = await get_farm_observations(rumi_integration, RUMI_BASE_URL, farm_action_config)
+
+    # Same model the validating parse produces for an untagged row
+    assert result == [FarmLocation.parse_obj({"_location": "40.38::-1.61", "_time": "2026-04-21T10:00:00Z", "device_name": "DEVICE001"})]
+    assert result[0].official_tag is None
+
+    transformed_data, _ = await transform("429face7-855e-4e01-9cc8-fe69bf437cd9", farm_action_config, {}, result)
+    assert transformed_data[0]["source"] == "DEVICE001"
+
+
+@pytest.mark.anyio
+async def test_get_farm_observations_normalizes_numeric_rumi_id(rumi_integration, farm_action_config):
+    animals = [
+        {"rumi_id": 12345, "official_tag": "TAG001", "locations": [{"_time": "2026-04-21T10:00:00Z", "location": "40.38::-1.61"}]},
+        {"rumi_id": "DEVICE002", "official_tag": "TAG002", "locations": [{"_time": "2026-04-21T11:00:00Z", "location": "40.39::-1.62"}]},
+    ]
+
+    with respx.mock:
+        respx.get(f"{RUMI_BASE_URL}/farms/farm123/rumi/realtime/timelapse").mock(
+            return_value=httpx.Response(200, json=animals)
+        )
+        result = await get_farm_observations(rumi_integration, RUMI_BASE_URL, farm_action_config)
+
+    assert [location.device_name for location in result] == ["12345", "DEVICE002"]
+    rumi_id_map = build_rumi_id_map({"cow": [{"rumi_id": 12345, "name": "Cow 1"}]})
+    assert rumi_id_map[result[0].device_name]["subject_type"] == "rumi-cow"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("animal", [
+    {"official_tag": "TAG001", "locations": []},
+    {"rumi_id": None, "official_tag": "TAG001", "locations": []},
+], ids=["missing", "null"])
+async def test_get_farm_observations_rejects_rows_without_rumi_id(rumi_integration, farm_action_config, animal):
+    with respx.mock:
+        respx.get(f"{RUMI_BASE_URL}/farms/farm123/rumi/realtime/timelapse").mock(
+            return_value=httpx.Response(200, json=[animal])
+        )
+        with pytest.raises(msgspec.ValidationError):
+            await get_farm_observations(rumi_integration, RUMI_BASE_URL, farm_action_config)
+
+
+@pytest.mark.anyio
+async def test_get_animals_info_fetches_all_animal_types(rumi_integration):
+    config = PullFarmObservationsConfig(
+        start=datetime(2026, 4, 21, 0, 0, 0, tzinfo=timezone.utc),
+        farm_id="farm123",
+        farm_name="Test Farm",
+        user_id="user123",
+        token="testtoken",
+    )
+
+    with respx.mock:
+        bulls = respx.get(f"{RUMI_BASE_URL}/farms/farm123/bulls").mock(
+            return_value=httpx.Response(200, json=[{"rumi_id": "DEVICE002", "name": "Bull 1"}])
+        )
+        cows = respx.get(f"{RUMI_BASE_URL}/farms/farm123/cows").mock(
+            return_value=httpx.Response(200, json=MOCK_ANIMALS_INFO["cow"])
+        )
+        calves = respx.get(f"{RUMI_BASE_URL}/farms/farm123/calves").mock(
+            return_value=httpx.Response(200, json=[])
+        )
+        result = await get_animals_info(rumi_integration, RUMI_BASE_URL, config)
+
+    assert bulls.called and cows.called and calves.called
+    assert result == {
+        "bull": [{"rumi_id": "DEVICE002", "name": "Bull 1"}],
+        "cow": MOCK_ANIMALS_INFO["cow"],
+    }
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("2026-04-21T10:00:00Z", datetime(2026, 4, 21, 10, 0, 0, tzinfo=timezone.utc)),
+    ("2026-04-21T10:00:00.123Z", datetime(2026, 4, 21, 10, 0, 0, 123000, tzinfo=timezone.utc)),
+    ("2026-04-21T10:00:00.123456Z", datetime(2026, 4, 21, 10, 0, 0, 123456, tzinfo=timezone.utc)),
+    ("2026-04-21T10:00:00", datetime(2026, 4, 21, 10, 0, 0, tzinfo=timezone.utc)),
+    ("2026-04-21T12:00:00+02:00", datetime(2026, 4, 21, 10, 0, 0, tzinfo=timezone.utc)),
+])
+def test_parse_rumi_timestamp(value, expected):
+    assert parse_rumi_timestamp(value) == expected
+
+
+@pytest.mark.anyio
+async def test_get_farm_observations_does_not_retry_client_errors(rumi_integration, farm_action_config):
+
+    with respx.mock:
+        route = respx.get(f"{RUMI_BASE_URL}/farms/farm123/rumi/realtime/timelapse").mock(
+            return_value=httpx.Response(400, json={"detail": "Bad request"})
+        )
+        with pytest.raises(httpx.HTTPStatusError):
+            await get_farm_observations(rumi_integration, RUMI_BASE_URL, farm_action_config)
+
+    assert route.call_count == 1
+
+
+@pytest.fixture
+def no_retry_wait(mocker):
+    # stamina 23.2 has no set_testing(); skip the backoff sleeps while keeping the retries
+    return mocker.patch("asyncio.sleep", new=AsyncMock(return_value=None))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("status_code", [429, 503])
+async def test_get_farms_retries_transient_errors(rumi_integration, no_retry_wait, status_code):
+    auth = AuthenticateConfig(user_id="user123", token="testtoken")
+
+    with respx.mock:
+        route = respx.get(f"{RUMI_BASE_URL}/users/user123/farms").mock(side_effect=[
+            httpx.Response(status_code),
+            httpx.Response(200, json=[{"_id": "farm1", "name": "Farm 1"}]),
+        ])
+        result = await get_farms(rumi_integration, RUMI_BASE_URL, auth)
+
+    assert route.call_count == 2
+    assert result == [Farm(id="farm1", name="Farm 1")]
+
+
+@pytest.mark.anyio
+async def test_rate_limited_responses_do_not_reset_circuit_breaker(mocker, rumi_integration, no_retry_wait):
+    auth = AuthenticateConfig(user_id="user123", token="testtoken")
+    breaker = RumiCircuitBreaker()
+    breaker.failures = 3
+    mocker.patch.dict("app.actions.client._circuit_breakers", {RUMI_BASE_URL: breaker})
+
+    with respx.mock:
+        respx.get(f"{RUMI_BASE_URL}/users/user123/farms").mock(return_value=httpx.Response(429))
+        with pytest.raises(httpx.HTTPStatusError):
+            await get_farms(rumi_integration, RUMI_BASE_URL, auth)
+
+    assert breaker.failures == 3
+
+
+@pytest.mark.anyio
+async def test_get_farms_raises_http_status_error_after_retries(rumi_integration, no_retry_wait):
+    auth = AuthenticateConfig(user_id="user123", token="testtoken")
+
+    with respx.mock:
+        route = respx.get(f"{RUMI_BASE_URL}/users/user123/farms").mock(return_value=httpx.Response(503))
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await get_farms(rumi_integration, RUMI_BASE_URL, auth)
+
+    assert route.call_count == 4
+    assert exc_info.value.response.status_code == 503
+
+
+@pytest.mark.anyio
+async def test_get_farms_parses_farm_list(rumi_integration):
+    auth = AuthenticateConfig(user_id="user123", token="testtoken")
+
+    with respx.mock:
+        route = respx.get(f"{RUMI_BASE_URL}/users/user123/farms").mock(
+            return_value=httpx.Response(200, json=[
+                {"_id": "farm1", "name": "Farm 1", "nif": "B123"},
+                {"_id": "farm2", "name": "Farm 2"},
+            ])
+        )
+        result = await get_farms(rumi_integration, RUMI_BASE_URL, auth)
+
+    assert route.calls.last.request.headers["Authorization"] == "Token testtoken"
+    assert result == [
+        Farm(id="farm1", name="Farm 1", nif="B123"),
+        Farm(id="farm2", name="Farm 2"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_transform_uses_animal_info(farm_action_config):
+    unknown_device = FarmLocation.parse_obj(
+        {"_location": "40.40::-1.63", "_time": "2026-04-21T12:00:00Z", "device_name": "DEVICE999", "official_tag": "TAG999"}
+    )
+    rumi_id_map = build_rumi_id_map(MOCK_ANIMALS_INFO)
+
+    transformed_data, latest_time = await transform(
+        "429face7-855e-4e01-9cc8-fe69bf437cd9", farm_action_config, rumi_id_map, [*MOCK_FARM_LOCATIONS, unknown_device]
+    )
+
+    assert latest_time == unknown_device.time
+    assert transformed_data[0]["source_name"] == "Cow 1 (DEVICE001)"
+    assert transformed_data[0]["subject_type"] == "rumi-cow"
+    assert transformed_data[0]["additional"] == {
+        "farm_id": "farm123",
+        "farm_name": "Test Farm",
+        "subject_name": "Cow 1 (DEVICE001)",
+        "type": "cow",
+        "rumi_id": "DEVICE001",
+        "name": "Cow 1",
+        "official_tag": "TAG001",
+    }
+    assert transformed_data[2]["source_name"] == "TAG999 (DEVICE999)"
+    assert transformed_data[2]["subject_type"] == "unassigned"
@@ -0,0 +1,58 @@
+import pydantic
+
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class Farm(pydantic.BaseModel):
+    id: str = pydantic.Field(alias='_id')
+    name: str
+    nif: Optional[str]
+    rega: Optional[str]
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class FarmLocation(pydantic.BaseModel):
+    location: tuple[float, float] = pydantic.Field(alias='_location')
+    time: datetime = pydantic.Field(alias='_time')
+    device_name: str
+    # Rumi omits the tag for untagged animals; transform falls back to device_name
+    official_tag: Optional[str]
+
+    @pydantic.validator('time', always=True)
+    def parse_time_string(cls, v):
+        if not v.tzinfo:
+            return v.replace(tzinfo=timezone.utc)
+        return v
+
+    @pydantic.validator('location', pre=True, always=True)
+    def split_location(cls, v):
+        lat, lon = v.split("::")
+        return float(lat), float(lon)
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class RumiNotFoundException(Exception):
+    def __init__(self, error: Exception, message: str, status_code=404):
+        self.status_code = status_code
+        self.message = message
+        self.error = error
+        super().__init__(f"'{self.status_code}: {self.message}, Error: {self.error}'")
+
+
+class RumiUnauthorizedException(Exception):
+    def __init__(self, error: Exception, message: str, status_code=401):
+        self.status_code = status_code
+        self.message = message
+        self.error = error
+        super().__init__(f"'{self.status_code}: {self.message}, Error: {self.error}'")
+
+
+class RumiCircuitOpenException(Exception):
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        super().__init__(f"Circuit open for Rumi API at '{base_url}', skipping request")
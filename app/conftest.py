@@ -68,6 +68,9 @@ def mock_redis(mocker, mock_integration_state):
     redis_client.get.return_value = async_return(
         json.dumps(mock_integration_state, default=str)
     )
+    redis_client.mget.return_value = async_return(
+        [json.dumps(mock_integration_state, default=str), None]
+    )
     redis_client.delete.return_value = async_return(MagicMock())
     redis_client.setex.return_value = async_return(None)
     redis_client.incr.return_value = redis_client
@@ -960,18 +963,25 @@ def integration_event_pubsub_message():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def gcp_pubsub_publish_response():
     return {"messageIds": ["7061707768812258"]}
 
 
-@pytest.fixture
-def mock_publish_event(gcp_pubsub_publish_response):
+@pytest.fixture(scope="module")
+def module_publish_event(gcp_pubsub_publish_response):
+    # Built once per module; tests get it through mock_publish_event, which resets it
     mock_publish_event = AsyncMock()
     mock_publish_event.return_value = gcp_pubsub_publish_response
     return mock_publish_event
 
 
+@pytest.fixture
+def mock_publish_event(module_publish_event):
+    yield module_publish_event
+    module_publish_event.reset_mock()
+
+
 class MockPullActionConfiguration(PullActionConfiguration):
     lookback_days: int = FieldWithUIOptions(
         30,
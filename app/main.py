@@ -14,6 +14,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.services.action_runner import execute_action, _portal
 from app.services.self_registration import register_integration_in_gundi
 from app.services.webhooks import close_diagnostic_client
+from app.actions.client import close_rumi_client
 
 
 # For running behind a proxy, we'll want to configure the root path for OpenAPI browser.
@@ -30,6 +31,7 @@ async def lifespan(app: FastAPI):
     # Shutdown Hook
     await _portal.close()
     await close_diagnostic_client()
+    await close_rumi_client()
 
 
 app = FastAPI(
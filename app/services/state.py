@@ -1,4 +1,5 @@
 import json
+import orjson
 import stamina
 import httpx
 import redis.asyncio as redis
@@ -17,9 +18,22 @@ class IntegrationStateManager:
         for attempt in stamina.retry_context(on=redis.RedisError, attempts=5, wait_initial=1.0, wait_max=30, wait_jitter=3.0):
             with attempt:
                 json_value = await self.db_client.get(f"integration_state.{integration_id}.{action_id}.{source_id}")
-        value = json.loads(json_value) if json_value else {}
+        value = orjson.loads(json_value) if json_value else {}
         return value
 
+    async def mget_state(self, integration_id: str, action_id: str, source_ids: list) -> dict:
+        if not source_ids:
+            return {}
+        for attempt in stamina.retry_context(on=redis.RedisError, attempts=5, wait_initial=1.0, wait_max=30, wait_jitter=3.0):
+            with attempt:
+                json_values = await self.db_client.mget(
+                    [f"integration_state.{integration_id}.{action_id}.{source_id}" for source_id in source_ids]
+                )
+        return {
+            source_id: orjson.loads(json_value) if json_value else {}
+            for source_id, json_value in zip(source_ids, json_values)
+        }
+
     async def set_state(self, integration_id: str, action_id: str, state: dict, source_id: str = "no-source", expire: int = None):
         for attempt in stamina.retry_context(on=redis.RedisError, attempts=5, wait_initial=1.0, wait_max=30, wait_jitter=3.0):
             with attempt:
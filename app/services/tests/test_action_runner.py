@@ -201,11 +201,11 @@ async def test_execute_action_from_api_with_invalid_config(
 
 @pytest.mark.asyncio
 async def test_trigger_subaction(
-        mocker, mock_gundi_client_v2, integration_v2, mock_config_manager,
+        mocker, monkeypatch, mock_gundi_client_v2, integration_v2, mock_config_manager,
         mock_publish_event, mock_action_handlers,
 ):
-    settings.TRIGGER_ACTIONS_ALWAYS_SYNC = False
-    settings.INTEGRATION_COMMANDS_TOPIC = "integration-actions-topic"
+    monkeypatch.setattr(settings, "TRIGGER_ACTIONS_ALWAYS_SYNC", False)
+    monkeypatch.setattr(settings, "INTEGRATION_COMMANDS_TOPIC", "integration-actions-topic")
     mocker.patch("app.services.action_runner.action_handlers", mock_action_handlers)
     mocker.patch("app.services.action_runner._portal", mock_gundi_client_v2)
     mocker.patch("app.services.action_runner.config_manager", mock_config_manager)
@@ -241,10 +241,10 @@ async def test_trigger_subaction(
 
 @pytest.mark.asyncio
 async def test_trigger_subaction_sync(
-        mocker, mock_gundi_client_v2, integration_v2, mock_config_manager,
+        mocker, monkeypatch, mock_gundi_client_v2, integration_v2, mock_config_manager,
         mock_publish_event, mock_action_handlers,
 ):
-    settings.TRIGGER_ACTIONS_ALWAYS_SYNC = True
+    monkeypatch.setattr(settings, "TRIGGER_ACTIONS_ALWAYS_SYNC", True)
     mocker.patch("app.services.action_runner.action_handlers", mock_action_handlers)
     mocker.patch("app.services.action_runner._portal", mock_gundi_client_v2)
     mocker.patch("app.services.action_runner.config_manager", mock_config_manager)
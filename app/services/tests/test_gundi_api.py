@@ -1,4 +1,10 @@
+import datetime
+import json
+
+import httpx
 import pytest
+import respx
+
 from app.services.gundi import send_events_to_gundi, send_observations_to_gundi, send_event_attachments_to_gundi
 
 
@@ -121,3 +127,28 @@ async def test_send_observations_to_gundi(
     assert len(response) == 2
     assert mock_gundi_sensors_client_class.called
     mock_gundi_sensors_client_class.return_value.post_observations.assert_called_once_with(data=observations)
+
+
+@pytest.mark.asyncio
+async def test_send_observations_to_gundi_recorded_at_wire_format(
+        mocker, mock_get_gundi_api_key, integration_v2, observations_created_response
+):
+    # Handlers pass datetimes in recorded_at; pin how they go over the wire
+    mocker.patch("app.services.gundi._get_gundi_api_key", mock_get_gundi_api_key)
+    mocker.patch("gundi_client_v2.client.settings.SENSORS_API_BASE_URL", "https://sensors.api.gundiservice.org")
+    observations = [
+        {
+            "source": "device-xy123",
+            "type": "tracking-device",
+            "recorded_at": datetime.datetime(2024, 1, 24, 12, 3, 0, tzinfo=datetime.timezone.utc),
+            "location": {"lat": -51.748, "lon": -72.720},
+        }
+    ]
+    with respx.mock:
+        route = respx.post("https://sensors.api.gundiservice.org/v2/observations/").mock(
+            return_value=httpx.Response(201, json=observations_created_response)
+        )
+        await send_observations_to_gundi(observations=observations, integration_id=integration_v2.id)
+
+    sent = json.loads(route.calls.last.request.content)
+    assert sent[0]["recorded_at"] == "2024-01-24 12:03:00+00:00"
@@ -122,6 +122,25 @@ async def test_get_state_source_state(mocker, mock_redis, integration_v2, mock_i
     )
 
 
+@pytest.mark.asyncio
+async def test_mget_state_source_states(mocker, mock_redis, integration_v2, mock_integration_state):
+    mocker.patch("app.services.state.redis", mock_redis)
+    state_manager = IntegrationStateManager()
+    integration_id = str(integration_v2.id)
+
+    states = await state_manager.mget_state(
+        integration_id=integration_id,
+        action_id="pull_observations",
+        source_ids=["device-123", "device-456"]
+    )
+
+    assert states == {"device-123": mock_integration_state, "device-456": {}}
+    mock_redis.Redis.return_value.mget.assert_called_once_with([
+        f"integration_state.{integration_id}.pull_observations.device-123",
+        f"integration_state.{integration_id}.pull_observations.device-456",
+    ])
+
+
 @pytest.mark.asyncio
 async def test_delete_state_source_state(mocker, mock_redis, integration_v2, mock_integration_state):
     mocker.patch("app.services.state.redis", mock_redis)